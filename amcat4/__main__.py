@@ -7,6 +7,7 @@ import csv
 import io
 import json
 import logging
+import operator
 import os
 import secrets
 import sys
@@ -19,7 +20,7 @@ from pydantic.fields import ModelField
 
 from amcat4 import index
 from amcat4.config import get_settings, AuthOptions, Settings, validate_settings
-from amcat4.elastic import connect_elastic, get_system_version, ping, upload_documents
+from amcat4.elastic import bulk_ingest_settings, connect_elastic, get_system_version, ping, upload_documents
 from amcat4.index import GLOBAL_ROLES, create_index, set_global_role, Role, list_global_users
 
 SOTU_INDEX = "state_of_the_union"
@@ -29,20 +30,27 @@ def upload_test_data() -> str:
     url = "https://raw.githubusercontent.com/ccs-amsterdam/example-text-data/master/sotu.csv"
     url_open = urllib.request.urlopen(url)
     csv.field_size_limit(sys.maxsize)
-    csvfile = csv.DictReader(io.TextIOWrapper(url_open, encoding='utf-8'))
+    rows = csv.reader(io.TextIOWrapper(url_open, encoding='utf-8', newline=''))
+    header = next(rows)
+    # Select the needed columns by position rather than building a dict for every row
+    select_columns = operator.itemgetter(*[header.index(col) for col in ["Year", "President", "Date", "Text", "Party"]])
 
     # creates the index info on the sqlite db
     create_index(SOTU_INDEX)
 
-    docs = [dict(title="{Year}: {President}".format(**row),
-                 text=row['Text'],
-                 date=row['Date'],
-                 president=row['President'],
-                 year=row['Year'],
-                 party=row['Party'])
-            for row in csvfile]
+    # Generator, so documents are uploaded while the csv is still being downloaded and parsed
+    docs = (dict(title=f"{year}: {president}",
+                 text=text,
+                 date=date,
+                 president=president,
+                 year=year,
+                 party=party)
+            # skip empty rows (blank lines), as csv.DictReader would
+            for (year, president, date, text, party) in map(select_columns, filter(None, rows)))
     columns = {"president": "keyword", "party": "keyword", "year": "double"}
-    upload_documents(SOTU_INDEX, docs, columns)
+    with bulk_ingest_settings(SOTU_INDEX):
+        # The index is new, so no need to deduplicate and we can let elastic assign the ids
+        upload_documents(SOTU_INDEX, docs, columns, deduplicate=False)
     return SOTU_INDEX
 
 
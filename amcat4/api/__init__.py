@@ -2,6 +2,7 @@
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
 from amcat4.api.index import app_index
 from amcat4.api.info import app_info
@@ -11,6 +12,7 @@ from amcat4.api.users import app_users
 app = FastAPI(
     title="AmCAT4",
     description=__doc__,
+    default_response_class=ORJSONResponse,
     openapi_tags=[
         dict(name="users", description="Endpoints for user management"),
         dict(name="index", description="Endpoints to create, list, and delete indices; and to add or modify documents"),
@@ -2,17 +2,18 @@
 import functools
 import logging
 from datetime import datetime
+from typing import Optional, Union
 
 import requests
 from authlib.common.errors import AuthlibBaseError
-from authlib.jose import jwt
+from authlib.jose import JsonWebKey, jwt
 from fastapi import HTTPException
 from fastapi.params import Depends
 from fastapi.security import OAuth2PasswordBearer
 from starlette.status import HTTP_401_UNAUTHORIZED
 
 from amcat4.config import get_settings, AuthOptions
-from amcat4.index import Role, get_role, get_global_role
+from amcat4.index import Index, Role, get_global_role, get_index_role, get_role
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token", auto_error=False)
 
@@ -28,6 +29,12 @@ def get_middlecat_config(middlecat_url) -> dict:
     return r.json()
 
 
+@functools.lru_cache()
+def get_middlecat_public_key(middlecat_url):
+    """Get the public key of the middlecat server, parsed once rather than on every token verification"""
+    return JsonWebKey.import_key(get_middlecat_config(middlecat_url)['public_key'])
+
+
 def verify_token(token: str) -> dict:
     """
     Verifies the given token and returns the payload
@@ -52,7 +59,17 @@ def decode_middlecat_token(token: str) -> dict:
     url = get_settings().middlecat_url
     if not url:
         raise InvalidToken("No middlecat defined, cannot decrypt middlecat token")
-    public_key = get_middlecat_config(url)['public_key']
+    return dict(_decode_token(token, url))
+
+
+@functools.lru_cache(maxsize=1024)
+def _decode_token(token: str, middlecat_url: str) -> dict:
+    """
+    Decode the token and check its signature.
+    This is the expensive part of verifying a token, so it is cached per token. Invalid tokens raise an
+    exception and are not cached, and the claims (e.g. expiry) are checked on every call by verify_token
+    """
+    public_key = get_middlecat_public_key(middlecat_url)
     try:
         return jwt.decode(token, public_key)
     except AuthlibBaseError as e:
@@ -82,28 +99,40 @@ def check_global_role(user: str, required_role: Role, raise_error=True):
         return False
 
 
-def check_role(user: str, required_role: Role, index: str, required_global_role: Role = Role.ADMIN):
+def check_role(user: str, required_role: Role, index: Union[str, Index],
+               required_global_role: Optional[Role] = Role.ADMIN):
     """Check if the given user have at least the given role (in the index, if given), raise Exception otherwise.
 
     :param user: The email address of the authenticated user
     :param required_role: The minimum role of the user on the given index
-    :param index: The index to check the role on
-    :param required_global_role: If the user has this global role (default: admin), also allow them access
+    :param index: The index to check the role on. If the Index was already retrieved, pass the Index object
+                  rather than the name to avoid looking it up again
+    :param required_global_role: If the user has this global role (default: admin), also allow them access.
+                                 If None, only check the index role (e.g. if the global role was already checked)
     :return: the actual role of the user on this index
     """
     # First, check global role (also checks that user exists and deals with 'admin' special user)
-    if check_global_role(user, required_global_role, raise_error=False):
-        return get_role(index, user)
+    if required_global_role and check_global_role(user, required_global_role, raise_error=False):
+        return _get_role(index, user)
     # Global role check was false, so now check local role
-    actual_role = get_role(index, user)
+    actual_role = _get_role(index, user)
     if actual_role and actual_role >= required_role:
         return actual_role
     else:
+        name = index.id if isinstance(index, Index) else index
         raise HTTPException(status_code=401, detail=f"User {user} does not have "
-                            f"{required_role.name.title()} permissions on index {index}")
+                            f"{required_role.name.title()} permissions on index {name}")
+
+
+def _get_role(index: Union[str, Index], user: str) -> Optional[Role]:
+    if isinstance(index, Index):
+        return get_index_role(index, user)
+    return get_role(index, user)
 
 
-async def authenticated_user(token: str = Depends(oauth2_scheme)) -> str:
+# Note: the dependencies below are deliberately not async, as they do blocking calls to elastic (and middlecat).
+# FastAPI runs regular functions in a threadpool, so they do not block the event loop
+def authenticated_user(token: str = Depends(oauth2_scheme)) -> str:
     """Dependency to verify and return a user based on a token."""
     auth = get_settings().auth
     if token is None:
@@ -126,14 +155,14 @@ async def authenticated_user(token: str = Depends(oauth2_scheme)) -> str:
     return user
 
 
-async def authenticated_writer(user: str = Depends(authenticated_user)):
+def authenticated_writer(user: str = Depends(authenticated_user)):
     """Dependency to verify and return a global writer user based on a token."""
     if get_settings().auth != AuthOptions.no_auth:
         check_global_role(user, Role.WRITER)
     return user
 
 
-async def authenticated_admin(user: str = Depends(authenticated_user)):
+def authenticated_admin(user: str = Depends(authenticated_user)):
     """Dependency to verify and return a global writer user based on a token."""
     if get_settings().auth != AuthOptions.no_auth:
         check_global_role(user, Role.ADMIN)
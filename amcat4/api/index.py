@@ -11,10 +11,10 @@ from pydantic.config import Extra
 
 from amcat4 import elastic, index
 from amcat4.api.auth import (authenticated_user, authenticated_writer,
-                             check_role)
+                             check_global_role, check_role)
 from amcat4.api.common import py2dict
-from amcat4.index import (Index, IndexDoesNotExist, Role, get_global_role, get_index,
-                          get_role, list_known_indices, list_users)
+from amcat4.index import (Index, IndexDoesNotExist, Role, get_index,
+                          get_index_role, list_known_indices, list_users)
 from amcat4.index import refresh_index as es_refresh_index
 from amcat4.index import refresh_system_index, remove_role, set_role
 
@@ -22,6 +22,9 @@ app_index = APIRouter(
     prefix="/index",
     tags=["index"])
 
+# Uploads with more documents than this are done with refresh disabled, see elastic.bulk_ingest_settings
+BULK_INGEST_THRESHOLD = 500
+
 RoleType = Literal["ADMIN", "WRITER", "READER", "METAREADER", "admin", "writer", "reader", "metareader"]
 
 
@@ -104,13 +107,14 @@ def view_index(ix: str, user: str = Depends(authenticated_user)):
     View the index.
     """
     try:
-        role = check_role(user, Role.METAREADER, ix, required_global_role=Role.WRITER)
-        d = get_index(ix)._asdict()
-        d['user_role'] = role and role.name
-        d['guest_role'] = d['guest_role'].name if d.get('guest_role') else None
-        return d
+        ix_info = get_index(ix)
     except IndexDoesNotExist:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Index {ix} does not exist")
+    role = check_role(user, Role.METAREADER, ix_info, required_global_role=Role.WRITER)
+    d = ix_info._asdict()
+    d['user_role'] = role and role.name
+    d['guest_role'] = d['guest_role'].name if d.get('guest_role') else None
+    return d
 
 
 @app_index.delete("/{ix}", status_code=status.HTTP_204_NO_CONTENT, response_class=Response)
@@ -139,20 +143,29 @@ def upload_documents(
         ix: str,
         documents: List[Document] = Body(None, description="The documents to upload"),
         columns: Optional[Mapping[str, str]] = Body(None, description="Optional Specification of field (column) types"),
+        deduplicate: bool = Body(True, description="If true, documents without _id get a hash of their contents as id, "
+                                                   "so uploading a document twice does not create a duplicate. "
+                                                   "If false, elastic assigns the ids, which is faster"),
         user: str = Depends(authenticated_user)):
     """
     Upload documents to this server.
 
-    JSON payload should contain a `documents` key, and may contain a `columns` key:
+    JSON payload should contain a `documents` key, and may contain a `columns` and `deduplicate` key:
     {
       "documents": [{"title": .., "date": .., "text": .., ...}, ...],
-      "columns": {<field>: <type>, ...}
+      "columns": {<field>: <type>, ...},
+      "deduplicate": true|false
     }
+    Documents with an `_id` are always stored with that id.
     Returns a list of ids for the uploaded documents
     """
     check_role(user, Role.WRITER, ix)
-    documents = [py2dict(doc) for doc in documents]
-    return elastic.upload_documents(ix, documents, columns)
+    # Convert the documents lazily, so we don't create a second list of all documents
+    docs = (py2dict(doc) for doc in documents)
+    if len(documents) > BULK_INGEST_THRESHOLD:
+        with elastic.bulk_ingest_settings(ix):
+            return elastic.upload_documents(ix, docs, columns, deduplicate=deduplicate)
+    return elastic.upload_documents(ix, docs, columns, deduplicate=deduplicate)
 
 
 @app_index.get("/{ix}/documents/{docid}")
@@ -234,15 +247,18 @@ def list_index_users(ix: str, user: str = Depends(authenticated_user)):
 
     Allowed for global admin and local readers
     """
-    if get_global_role(user) != Role.ADMIN:
-        check_role(user, Role.READER, ix)
+    if not check_global_role(user, Role.ADMIN, raise_error=False):
+        check_role(user, Role.READER, ix, required_global_role=None)
     return [{"email": u, "role": r.name} for (u, r) in list_users(ix).items()]
 
 
 def _check_can_modify_user(ix, user, target_user, target_role):
-    if get_global_role(user) != Role.ADMIN:
-        required_role = Role.ADMIN if (target_role == Role.ADMIN or get_role(ix, target_user) == Role.ADMIN) else Role.WRITER
-        check_role(user, required_role, ix)
+    if not check_global_role(user, Role.ADMIN, raise_error=False):
+        # Retrieve the index once to check both the current role of the target user and the role of the user
+        ix_info = get_index(ix)
+        current_role = get_index_role(ix_info, target_user)
+        required_role = Role.ADMIN if (target_role == Role.ADMIN or current_role == Role.ADMIN) else Role.WRITER
+        check_role(user, required_role, ix_info, required_global_role=None)
 
 
 @app_index.post("/{ix}/users", status_code=status.HTTP_201_CREATED)
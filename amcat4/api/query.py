@@ -24,6 +24,7 @@ class QueryMeta(BaseModel):
     page_count: Optional[int]
     page: Optional[int]
     scroll_id: Optional[str]
+    search_after: Optional[List[Any]]
 
 
 class QueryResult(BaseModel):
@@ -160,6 +161,9 @@ def query_documents_post(
                           "This will return a scroll_id which should be passed to subsequent calls"
                           "(this is the advised way of scrolling through multiple pages of results)", example="5m"),
     scroll_id: Optional[str] = Body(None, description="Scroll id from previous response to continue scrolling"),
+    search_after: Optional[List[Any]] = Body(
+        None, description="Sort values (meta.search_after) from a previous response to get the next page of results. "
+                          "Requires a (unique) sort order, and is more efficient than page for deep pagination"),
     annotations: Optional[bool] = Body(None, description="Return _annotations with query matches as annotations"),
     highlight: Optional[Union[bool, Dict]] = Body(
         None, description="Highlight document. 'true' highlights whole document, see elastic docs for dict format"
@@ -169,9 +173,15 @@ def query_documents_post(
     """
     List or query documents in this index.
 
-    Returns a JSON object {data: [...], meta: {total_count, per_page, page_count, page|scroll_id}}
+    Returns a JSON object {data: [...], meta: {total_count, per_page, page_count, page|scroll_id, search_after}}
     """
     # TODO check user rights on index
+    if search_after is not None:
+        if sort is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="search_after requires a sort order")
+        if scroll or scroll_id:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail="search_after cannot be combined with scroll or scroll_id")
     # Standardize fields, queries and filters to their most versatile format
     indices = index.split(",")
     if fields:
@@ -182,7 +192,7 @@ def query_documents_post(
     filters = dict(_process_filters(filters))
     r = query.query_documents(indices, queries=queries, filters=filters, fields=fields,
                               sort=sort, per_page=per_page, page=page, scroll_id=scroll_id, scroll=scroll,
-                              annotations=annotations, highlight=highlight)
+                              search_after=search_after, annotations=annotations, highlight=highlight)
     if r is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No results")
     return r.as_dict()
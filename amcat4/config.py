@@ -71,6 +71,14 @@ class Settings(BaseSettings):
     #: Email address for a hardcoded admin email (useful for setup and recovery)
     admin_email: str = None
 
+    #: Number of documents to send to elasticsearch per bulk request
+    bulk_chunk_size: int = 500
+
+    #: Number of threads to use for bulk uploads larger than bulk_chunk_size (smaller uploads use a single request).
+    #: Note that every API worker can run this many bulk requests at once, and that these are not retried
+    #: if elastic rejects them because it is too busy (429), so make sure elastic's write queue can handle them
+    bulk_threads: int = 4
+
     class Config:
         env_prefix = "amcat4_"
 
@@ -1,3 +1,4 @@
+import functools
 from inspect import isclass
 from typing import Optional, Iterable
 
@@ -96,10 +97,16 @@ class Weeknr(DateMapping):
         return int(value)
 
 
-def interval_mapping(interval: str) -> Optional[DateMapping]:
+@functools.lru_cache()
+def interval_mapping(interval: Optional[str]) -> Optional[DateMapping]:
+    """
+    Get the date mapping for this interval, or None if it is not a mapped interval
+    (Cached, as this is called for every filter when building queries and for every value in aggregation results)
+    """
     for m in mappings():
         if m.interval == interval:
             return m
+    return None
 
 
 def mappings() -> Iterable[DateMapping]:
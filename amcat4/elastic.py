@@ -11,17 +11,34 @@ Some things to note:
 """
 import functools
 import hashlib
+import itertools
 import json
 import logging
-from typing import Mapping, List, Iterable, Optional, Tuple, Union, Sequence, Literal
+import threading
+from contextlib import contextmanager
+from typing import Dict, Mapping, List, Iterable, Optional, Tuple, Union, Sequence, Literal
 
 from elasticsearch import Elasticsearch, NotFoundError
-from elasticsearch.helpers import bulk
+from elasticsearch.helpers import parallel_bulk, streaming_bulk
 
 from amcat4.config import get_settings
 
 SYSTEM_INDEX_VERSION = 1
 
+# Maximum size of a single bulk request, elastic defaults to rejecting requests over 100MB
+BULK_MAX_CHUNK_BYTES = 50 * 1024 * 1024
+
+# Number of times a single-chunk upload is retried if elastic is too busy to accept it
+BULK_MAX_RETRIES = 3
+
+# Temporary index settings for bulk ingests, see bulk_ingest_settings
+BULK_INGEST_SETTINGS = {"index.refresh_interval": "-1", "index.translog.durability": "async"}
+
+# Running bulk ingests per index, with the index settings to restore when the last one finishes
+_BULK_INGESTS: Dict[str, int] = {}
+_BULK_INGEST_RESTORE: Dict[str, dict] = {}
+_BULK_INGEST_LOCK = threading.Lock()
+
 ES_MAPPINGS = {
    'long': {"type": "long"},
    'date': {"type": "date", "format": "strict_date_optional_time"},
@@ -66,12 +83,14 @@ def connect_elastic() -> Elasticsearch:
     Connect to the elastic server using the system settings
     """
     settings = get_settings()
+    # Compress request bodies: bulk uploads and query results are mostly text and compress very well
     if settings.elastic_password:
         return Elasticsearch(settings.elastic_host or None,
                              basic_auth=("elastic", settings.elastic_password),
-                             verify_certs=settings.elastic_verify_ssl)
+                             verify_certs=settings.elastic_verify_ssl,
+                             http_compress=True)
     else:
-        return Elasticsearch(settings.elastic_host or None)
+        return Elasticsearch(settings.elastic_host or None, http_compress=True)
 
 
 def get_system_version(elastic=None) -> Optional[int]:
@@ -154,13 +173,19 @@ def _get_hash(document: dict) -> bytes:
     return m.hexdigest()
 
 
-def upload_documents(index: str, documents, fields: Mapping[str, str] = None) -> None:
+def upload_documents(index: str, documents, fields: Mapping[str, str] = None, deduplicate=True) -> List[str]:
     """
     Upload documents to this index
+    Documents are sent to elastic in batches of (at most) bulk_chunk_size documents, see config.py.
+    If there is more than one batch, they are sent in parallel by bulk_threads threads
 
     :param index: The name of the index (without prefix)
     :param documents: A sequence of article dictionaries
     :param fields: A mapping of field:type for field types
+    :param deduplicate: If True (default), documents without an _id get a hash of their contents as id,
+                        so uploading the same document twice does not create a duplicate.
+                        If False, elastic generates the ids, which is faster for large uploads.
+    :return: The ids of the uploaded documents
     """
     def es_actions(index, documents):
         field_types = get_index_fields(index)
@@ -168,15 +193,62 @@ def upload_documents(index: str, documents, fields: Mapping[str, str] = None) ->
             for key in document.keys():
                 if key in field_types:
                     document[key] = coerce_type_to_elastic(document[key], field_types[key].get("type"))
-            if "_id" not in document:
+            if deduplicate and "_id" not in document:
                 document["_id"] = _get_hash(document)
             yield {"_index": index, **document}
 
     if fields:
         set_fields(index, fields)
 
-    actions = list(es_actions(index, documents))
-    bulk(es(), actions)
+    settings = get_settings()
+    actions = es_actions(index, documents)
+    first_chunk = list(itertools.islice(actions, settings.bulk_chunk_size + 1))
+    if len(first_chunk) <= settings.bulk_chunk_size:
+        # Small uploads are sent in a single request, no need for threads. streaming_bulk also retries if elastic
+        # rejects the request because it is too busy (429)
+        results = streaming_bulk(es(), first_chunk, chunk_size=settings.bulk_chunk_size,
+                                 max_chunk_bytes=BULK_MAX_CHUNK_BYTES, max_retries=BULK_MAX_RETRIES)
+    else:
+        results = parallel_bulk(es(), itertools.chain(first_chunk, actions),
+                                thread_count=settings.bulk_threads,
+                                chunk_size=settings.bulk_chunk_size,
+                                max_chunk_bytes=BULK_MAX_CHUNK_BYTES,
+                                queue_size=4)
+    # The bulk helpers are lazy, so we need to consume the results to actually upload the documents
+    return [info['index']['_id'] for (_ok, info) in results]
+
+
+@contextmanager
+def bulk_ingest_settings(index: str):
+    """
+    Temporarily disable refreshing and per-request translog syncing on this index to speed up bulk uploads.
+    On exit, the index is refreshed, and the original settings are restored when the last running bulk ingest
+    on this index (in this process) finishes, so concurrent uploads don't restore each other's temporary settings.
+
+    Another process (e.g. another API worker) can be running a bulk ingest on the same index, or a crashed bulk ingest
+    can have left the temporary settings in place. So if the current settings are the temporary bulk settings,
+    they are never restored: the elastic defaults are restored instead.
+
+    :param index: The name of the index
+    """
+    names = list(BULK_INGEST_SETTINGS.keys())
+    with _BULK_INGEST_LOCK:
+        if not _BULK_INGESTS.get(index):
+            current = es().indices.get_settings(index=index, name=names, flat_settings=True)[index]["settings"]
+            # settings that were not explicitly set are reset to the elastic default by setting them to None
+            _BULK_INGEST_RESTORE[index] = {name: None if current.get(name) == value else current.get(name)
+                                           for (name, value) in BULK_INGEST_SETTINGS.items()}
+            es().indices.put_settings(index=index, settings=BULK_INGEST_SETTINGS)
+        _BULK_INGESTS[index] = _BULK_INGESTS.get(index, 0) + 1
+    try:
+        yield
+    finally:
+        with _BULK_INGEST_LOCK:
+            _BULK_INGESTS[index] -= 1
+            if not _BULK_INGESTS[index]:
+                del _BULK_INGESTS[index]
+                es().indices.put_settings(index=index, settings=_BULK_INGEST_RESTORE.pop(index))
+        es().indices.refresh(index=index)
 
 
 def get_field_mapping(type_: Union[str, dict]):
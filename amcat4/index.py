@@ -253,6 +253,14 @@ def get_role(index: str, email: str) -> Optional[Role]:
         return Role[role]
 
 
+def get_index_role(index: Index, email: str) -> Optional[Role]:
+    """
+    Get the role of this user from an already retrieved Index, or the guest role if user has no role
+    This is equivalent to get_role, but does not need to query elastic
+    """
+    return index.roles.get(email) or index.guest_role or None
+
+
 def get_guest_role(index: str) -> Optional[Role]:
     """
     Return the guest role for this index, raising a IndexDoesNotExist if the index does not exist
@@ -300,5 +308,19 @@ def list_global_users() -> Dict[str, Role]:
 def delete_user(email: str) -> None:
     """Delete this user from all indices"""
     set_global_role(email, None)
-    for ix in list_known_indices(email):
-        set_role(ix.id, email, None)
+    # Rather than a get and update per index (as set_role does), get the current roles of all indices with a
+    # single (realtime) mget, and remove the user from all of them in a single bulk request.
+    # The roles from list_known_indices can be stale, so only the mget decides which indices to update.
+    system_index = get_settings().system_index
+    ids = [ix.id for ix in list_known_indices()]
+    if not ids:
+        return
+    docs = es().mget(index=system_index, ids=ids, source_includes="roles")['docs']
+    actions = []
+    for doc in docs:
+        roles_dict = _roles_from_elastic(doc.get('_source', {}).get('roles', []))
+        if roles_dict.pop(email, None):
+            actions.append({"_op_type": "update", "_index": system_index, "_id": doc['_id'],
+                            "doc": dict(roles=_roles_to_elastic(roles_dict))})
+    if actions:
+        elasticsearch.helpers.bulk(es(), actions)
@@ -1,43 +1,53 @@
 """
 All things query
 """
+import re
 from math import ceil
-from re import finditer
-from re import sub
 from typing import Mapping, Iterable, Optional, Union, Sequence, Any, Dict, List, Tuple, Literal
 
-from .date_mappings import mappings
+from .date_mappings import interval_mapping
 from .elastic import es, update_tag_by_query
 
+# Matches a single highlighted term, see extract_highlight_span
+HIGHLIGHT_REGEX = re.compile('<em>.+?</em>')
 
-def build_body(queries: Iterable[str] = None, filters: Mapping = None, highlight: Union[bool, dict] = False,
-               ids: Iterable[str] = None):
+
+# Filter keys that are handled directly in build_body, other keys should be date mapping intervals
+RANGE_FILTERS = ('gt', 'gte', 'lt', 'lte')
+FILTER_KEYS = frozenset({'values', 'value', 'exists', *RANGE_FILTERS})
+
+
+def build_body(queries: Union[Mapping[str, str], Iterable[str]] = None, filters: Mapping = None,
+               highlight: Union[bool, dict] = False, ids: Iterable[str] = None):
+    """
+    Build the elastic query body
+    :param queries: a list of queries OR a dict {label1: query1, ...} (labels are ignored)
+    :param filters: a dict of filters, see query_documents
+    :param highlight: if True or a dict, add highlighting, see query_documents
+    :param ids: if given, only include documents with these ids
+    """
     def parse_filter(field, filter) -> Tuple[Mapping, Mapping]:
-        filter = filter.copy()
         extra_runtime_mappings = {}
-        field_filters = []
-        for value in filter.pop('values', []):
-            field_filters.append({"term": {field: value}})
+        field_filters = [{"term": {field: value}} for value in filter.get('values', [])]
         if 'value' in filter:
-            field_filters.append({"term": {field: filter.pop('value')}})
+            field_filters.append({"term": {field: filter['value']}})
         if 'exists' in filter:
-            if filter.pop('exists'):
+            if filter['exists']:
                 field_filters.append({"exists": {"field": field}})
             else:
                 field_filters.append({"bool": {"must_not": {"exists": {"field": field}}}})
-        for mapping in mappings():
-            if mapping.interval in filter:
-                value = filter.pop(mapping.interval)
+        unknown = {}
+        for key in filter.keys() - FILTER_KEYS:
+            if mapping := interval_mapping(key):
                 extra_runtime_mappings.update(mapping.mapping(field))
-                field_filters.append({"term": {mapping.fieldname(field): value}})
-        rangefilter = {}
-        for rangevar in ['gt', 'gte', 'lt', 'lte']:
-            if rangevar in filter:
-                rangefilter[rangevar] = filter.pop(rangevar)
+                field_filters.append({"term": {mapping.fieldname(field): filter[key]}})
+            else:
+                unknown[key] = filter[key]
+        if unknown:
+            raise ValueError(f"Unknown filter type(s): {unknown}")
+        rangefilter = {rangevar: filter[rangevar] for rangevar in RANGE_FILTERS if rangevar in filter}
         if rangefilter:
             field_filters.append({"range": {field: rangefilter}})
-        if filter:
-            raise ValueError(f"Unknown filter type(s): {filter}")
         return extra_runtime_mappings, {'bool': {'should': field_filters}}
 
     def parse_query(q: str) -> dict:
@@ -45,7 +55,7 @@ def build_body(queries: Iterable[str] = None, filters: Mapping = None, highlight
 
     def parse_queries(qs: Sequence[str]) -> dict:
         if len(qs) == 1:
-            return parse_query(list(qs)[0])
+            return parse_query(qs[0])
         else:
             return {"bool": {"should": [parse_query(q) for q in qs]}}
     if not (queries or filters or ids):
@@ -55,8 +65,7 @@ def build_body(queries: Iterable[str] = None, filters: Mapping = None, highlight
         for field, filter in filters.items():
             extra_runtime_mappings, filter_term = parse_filter(field, filter)
             fs.append(filter_term)
-            if extra_runtime_mappings:
-                runtime_mappings.update(extra_runtime_mappings)
+            runtime_mappings.update(extra_runtime_mappings)
     if queries:
         if isinstance(queries, dict):
             queries = queries.values()
@@ -69,7 +78,7 @@ def build_body(queries: Iterable[str] = None, filters: Mapping = None, highlight
     if highlight is True:
         highlight = {"number_of_fragments": 0}
     elif highlight:
-        highlight = {**{"number_of_fragments": 0, "fragment_size": 40, "type": "plain"}, **highlight}
+        highlight = {"number_of_fragments": 0, "fragment_size": 40, "type": "plain", **highlight}
     if highlight:
         body['highlight'] = {"type": 'unified', "require_field_match": True,
                              "fields": {"*": highlight}}
@@ -78,7 +87,8 @@ def build_body(queries: Iterable[str] = None, filters: Mapping = None, highlight
 
 class QueryResult:
     def __init__(self, data: List[dict],
-                 n: int = None, per_page: int = None, page: int = None, page_count: int = None, scroll_id: str = None):
+                 n: int = None, per_page: int = None, page: int = None, page_count: int = None, scroll_id: str = None,
+                 search_after: List = None):
         if n and (page_count is None) and (per_page is not None):
             page_count = ceil(n / per_page)
         self.data = data
@@ -87,6 +97,7 @@ class QueryResult:
         self.page_count = page_count
         self.per_page = per_page
         self.scroll_id = scroll_id
+        self.search_after = search_after
 
     def as_dict(self):
         meta = {"total_count": self.total_count,
@@ -97,6 +108,8 @@ class QueryResult:
             meta['scroll_id'] = self.scroll_id
         else:
             meta['page'] = self.page
+        if self.search_after:
+            meta['search_after'] = self.search_after
         return dict(meta=meta, results=self.data)
 
 
@@ -114,6 +127,7 @@ def query_documents(index: Union[str, Sequence[str]], queries: Union[Mapping[str
                     filters: Mapping[str, Mapping] = None,
                     highlight: Union[bool, dict] = False, annotations=False,
                     sort: List[Union[str, Mapping]] = None,
+                    search_after: List = None,
                     **kwargs) -> Optional[QueryResult]:
     """
     Conduct a query_string query, returning the found documents.
@@ -142,72 +156,121 @@ def query_documents(index: Union[str, Sequence[str]], queries: Union[Mapping[str
     :param sort: Sort order of results, can be either a single field or a list of fields.
                  In the list, each field is a string or a dict with options, e.g. ["id", {"date": {"order": "desc"}}]
                  (https://www.elastic.co/guide/en/elasticsearch/reference/current/sort-search-results.html)
+    :param search_after: if not None, get the page of results following the document with these sort values,
+                         rather than using the page parameter. This requires sort to be set (and to be unique,
+                         e.g. by including a unique id field), and is more efficient than page for deep pagination.
+                         For sorted queries, the search_after values of the last hit are included in the result.
+                         (https://www.elastic.co/guide/en/elasticsearch/reference/current/paginate-search-results.html)
     :param kwargs: Additional elements passed to Elasticsearch.search()
     :return: a QueryResult, or None if there is not scroll result anymore
     """
     if scroll or scroll_id:
         # set scroll to default also if scroll_id is given but no scroll time is known
         kwargs['scroll'] = '2m' if (not scroll or scroll is True) else scroll
-    queries = _normalize_queries(queries)
-    if sort is not None:
-        kwargs["sort"] = sort
+    if annotations:
+        # annotations need query labels, so convert to {label: query} dict
+        queries = _normalize_queries(queries)
     if scroll_id:
+        # The query body (and sort order) are fixed when the scroll is opened, so there is nothing to build here
         result = es().scroll(scroll_id=scroll_id, **kwargs)
         if not result['hits']['hits']:
             return None
     else:
-        body = build_body(queries.values(), filters, highlight)
+        body = build_body(queries, filters, highlight)
+        if sort is not None:
+            kwargs["sort"] = sort
 
         if fields:
             fields = fields if isinstance(fields, list) else list(fields)
             kwargs['_source'] = fields
-        if not scroll:
+        if search_after is not None:
+            if sort is None:
+                raise ValueError("search_after requires the results to be sorted")
+            if scroll:
+                raise ValueError("search_after cannot be combined with scroll")
+            kwargs['search_after'] = search_after
+        elif not scroll:
             kwargs['from_'] = page * per_page
         result = es().search(index=index, size=per_page, **body, **kwargs)
 
-    data = []
-    for hit in result['hits']['hits']:
-        hitdict = dict(_id=hit['_id'], **hit['_source'])
-        if annotations:
-            hitdict['_annotations'] = list(query_annotations(index, hit['_id'], queries))
-        if 'highlight' in hit:
-            for key in hit['highlight'].keys():
-                if hit['highlight'][key]:
-                    hitdict[key] = " ... ".join(hit['highlight'][key])
-        data.append(hitdict)
+    hits = result['hits']['hits']
+    data = list(_iter_hits(hits, queries, annotations))
     if scroll_id:
         return QueryResult(data, n=result['hits']['total']['value'], scroll_id=result['_scroll_id'])
     elif scroll:
         return QueryResult(data, n=result['hits']['total']['value'], per_page=per_page, scroll_id=result['_scroll_id'])
     else:
-        return QueryResult(data, n=result['hits']['total']['value'], per_page=per_page,  page=page)
+        next_search_after = hits[-1].get('sort') if hits else None
+        return QueryResult(data, n=result['hits']['total']['value'], per_page=per_page,  page=page,
+                           search_after=next_search_after)
+
+
+def _iter_hits(hits: List[dict], queries: Union[Mapping[str, str], Iterable[str], None],
+               annotations=False) -> Iterable[dict]:
+    """
+    Convert elastic hits to result dicts, including highlights and (if annotations is True) query annotations
+    """
+    if annotations:
+        hit_annotations = query_annotations_bulk([(hit['_index'], hit['_id']) for hit in hits],
+                                                 _normalize_queries(queries))
+    for hit in hits:
+        hitdict = dict(_id=hit['_id'], **hit['_source'])
+        if annotations:
+            hitdict['_annotations'] = hit_annotations[hit['_index'], hit['_id']]
+        for key, highlights in hit.get('highlight', {}).items():
+            if highlights:
+                hitdict[key] = " ... ".join(highlights)
+        yield hitdict
 
 
 def query_annotations(index: str, id: str, queries: Mapping[str,  str]) -> Iterable[Dict]:
     """
-    get query matches in annotation format. Currently does so per hit per query.
-    Per hit could be optimized, but per query seems necessary:
+    get query matches in annotation format for a single document, see query_annotations_bulk
+    """
+    return query_annotations_bulk([(index, id)], queries)[index, id]
+
+
+def query_annotations_bulk(docs: Sequence[Tuple[str, str]],
+                           queries: Mapping[str, str]) -> Dict[Tuple[str, str], List[Dict]]:
+    """
+    Get query matches in annotation format for multiple documents.
+    This needs a separate highlight search per document per query, as highlighting does not tell us which query matched:
     https://stackoverflow.com/questions/44621694/elasticsearch-highlight-with-multiple-queries-not-work-as-expected
+    To avoid a round trip per search, all searches are sent to elastic in a single msearch request.
+    :param docs: a sequence of (index, id) pairs
+    :param queries: a dict {label1: query1, ...}
+    :return: a dict {(index, id): [annotation, ...]}
     """
+    annotations: Dict[Tuple[str, str], List[Dict]] = {doc: [] for doc in docs}
+    if not (docs and queries):
+        return annotations
+    searches: List[dict] = []
+    keys: List[Tuple[Tuple[str, str], str]] = []
+    for index, id in docs:
+        for label, query in queries.items():
+            searches += [{"index": index}, build_body([query], {'_id': {'value': id}}, True)]
+            keys.append(((index, id), label))
+    result = es().msearch(searches=searches)
+    for (doc, label), response in zip(keys, result['responses']):
+        if 'error' in response:
+            raise ValueError(f"Error on retrieving annotations for document {doc}: {response['error']}")
+        annotations[doc] += _annotations_from_hits(response['hits']['hits'], label)
+    return annotations
 
-    if not queries:
-        return
-    for label, query in queries.items():
-        body = build_body([query], {'_id': {'value': id}}, True)
 
-        result = es().search(index=index, body=body)
-        hit = result['hits']['hits']
-        if len(hit) == 0:
+def _annotations_from_hits(hits: List[dict], label: str) -> Iterable[Dict]:
+    """Get the annotations from the (first) hit of a highlighted annotation query"""
+    if len(hits) == 0:
+        return
+    for field, highlights in hits[0]['highlight'].items():
+        text = hits[0]["_source"][field]
+        if isinstance(text, list):
             continue
-        for field, highlights in hit[0]['highlight'].items():
-            text = hit[0]["_source"][field]
-            if isinstance(text, list):
-                continue
-            for span in extract_highlight_span(text, highlights[0]):
-                span['variable'] = 'query'
-                span['value'] = label
-                span['field'] = field
-                yield span
+        for span in extract_highlight_span(text, highlights[0]):
+            span['variable'] = 'query'
+            span['value'] = label
+            span['field'] = field
+            yield span
 
 
 def extract_highlight_span(text: str, highlight: str):
@@ -223,10 +286,9 @@ def extract_highlight_span(text: str, highlight: str):
     trimmed_offset = len(text) - len(text.lstrip())
 
     side_by_side = '</em> <em>'
-    highlight = sub(side_by_side, ' ', highlight)
-    regex = '<em>.+?</em>'
+    highlight = highlight.replace(side_by_side, ' ')
     tagsize = 9  # <em></em>
-    for i, m in enumerate(finditer(regex, highlight)):
+    for i, m in enumerate(HIGHLIGHT_REGEX.finditer(highlight)):
         offset = trimmed_offset + m.start(0) - tagsize*i
         length = len(m.group(0)) - tagsize
         yield dict(offset=offset, length=length)
@@ -19,6 +19,7 @@ setup(
     ],
     install_requires=[
         "fastapi[all]",
+        "orjson",
         "elasticsearch~=8.6",
         "python-multipart",
         "python-dotenv",
@@ -44,8 +44,9 @@ def default_settings():
     get_settings().auth = AuthOptions.allow_guests
 
 
-@pytest.fixture()
+@pytest.fixture(scope="session")
 def client():
+    # The client holds no per-test state (authentication is passed per request), so share one for all tests
     return TestClient(api.app)
 
 
@@ -1,6 +1,7 @@
 from starlette.testclient import TestClient
 
 from amcat4 import elastic
+from amcat4.api.index import BULK_INGEST_THRESHOLD
 from amcat4.index import get_guest_role, Role, set_guest_role, set_role, remove_role
 from tests.tools import build_headers, post_json, get_json, check, refresh
 
@@ -60,7 +61,7 @@ def test_fields_upload(client: TestClient, user: str, index: str):
     check(client.post(f"/index/{index}/documents", headers=build_headers(user), json=body), 401)
 
     set_role(index, user, Role.WRITER)
-    post_json(client, f"/index/{index}/documents", user=user, json=body)
+    assert post_json(client, f"/index/{index}/documents", user=user, json=body) == ["0", "1", "2"]
     get_json(client, f"/index/{index}/refresh", expected=204)
     doc = get_json(client, f"/index/{index}/documents/0", user=user)
     assert set(doc.keys()) == {'date', 'text', 'title', 'x'}
@@ -74,6 +75,19 @@ def test_fields_upload(client: TestClient, user: str, index: str):
     assert set(get_json(client, f"/index/{index}/fields/x/values", user=user)) == {"a", "b"}
 
 
+def test_upload_bulk(client: TestClient, writer: str, index: str):
+    """Are large uploads visible immediately, with the index settings restored afterwards?"""
+    n = BULK_INGEST_THRESHOLD + 1
+    body = {"documents": [{"_id": str(i), "title": f"doc {i}", "text": "t", "date": "2021-01-01"} for i in range(n)]}
+    set_role(index, writer, Role.WRITER)
+    assert len(post_json(client, f"/index/{index}/documents", user=writer, json=body)) == n
+    # the bulk upload refreshes the index when it is done
+    assert post_json(client, f"/index/{index}/query", user=writer, expected=200)["meta"]["total_count"] == n
+    settings = elastic.es().indices.get_settings(index=index, flat_settings=True)[index]["settings"]
+    assert "index.refresh_interval" not in settings
+    assert "index.translog.durability" not in settings
+
+
 def test_set_get_delete_roles(client: TestClient, admin: str, writer: str, user: str, index: str):
     body = {"email": user, "role": "READER"}
     # Anon, unauthorized; READER can't add users
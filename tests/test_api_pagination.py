@@ -22,6 +22,17 @@ def test_pagination(client, index, user):
     assert r["meta"]["page"] == 3
     assert {h["i"] for h in r["results"]} == {60, 61, 62, 63, 64, 65}
 
+    # Test search_after
+    r = post_json(client, f"/index/{index}/query", expected=200, user=user, json={"sort": "i", "per_page": 20})
+    assert r["meta"]["search_after"] == [19]
+    r = post_json(client, f"/index/{index}/query", expected=200, user=user,
+                  json={"sort": "i", "per_page": 20, "search_after": r["meta"]["search_after"]})
+    assert {h["i"] for h in r["results"]} == set(range(20, 40))
+    # search_after needs a sort order, and cannot be used while scrolling
+    post_json(client, f"/index/{index}/query", expected=400, user=user, json={"search_after": [19]})
+    post_json(client, f"/index/{index}/query", expected=400, user=user,
+              json={"sort": "i", "search_after": [19], "scroll": "5m"})
+
 
 def test_scroll(client, index, user):
     upload(index, docs=[{"i": i} for i in range(66)])
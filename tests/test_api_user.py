@@ -75,7 +75,10 @@ def test_modify_user(client: TestClient, user, writer, admin):
     """Are the API endpoints and auth for modifying users correct?"""
     # Only admin can change users
     check(client.put(f"/users/{user}", headers=build_headers(user), json={'role': 'metareader'}), 401)
-    check(client.put(f"/users/{user}", headers=build_headers(admin), json={'role': 'admin'}), 200)
+    r = client.put(f"/users/{user}", headers=build_headers(admin), json={'role': 'admin'})
+    check(r, 200)
+    assert r.json() == {"email": user, "role": "ADMIN"}
+    # Also check that the role was actually stored, the response only reflects the request
     assert get_global_role(user).name == "ADMIN"
 
 
@@ -13,7 +13,7 @@ def test_upload_retrieve_document(index):
         {"term": "test",  "value": 0.2},
         {"term": "value", "value": 0.3}
      ])
-    elastic.upload_documents(index, [a])
+    assert elastic.upload_documents(index, [a]) == ["test"]
     d = elastic.get_document(index, "test")
     assert d['title'] == a['title']
     assert d['term_tfidf'] == a['term_tfidf']
@@ -85,3 +85,39 @@ def test_deduplication(index):
     elastic.upload_documents(index, [doc])
     refresh_index(index)
     assert query_documents(index).total_count == 1
+    # Without deduplication, elastic assigns a new id
+    doc = {"title": "titel", "text": "text", "date": datetime(2020, 1, 1)}
+    elastic.upload_documents(index, [doc], deduplicate=False)
+    refresh_index(index)
+    assert query_documents(index).total_count == 2
+
+
+def test_bulk_ingest_settings(index):
+    """Are index settings changed during and restored after bulk ingest?"""
+    def get_setting(name):
+        settings = elastic.es().indices.get_settings(index=index, name=name, flat_settings=True)
+        return settings[index]["settings"].get(name)
+
+    assert get_setting("index.refresh_interval") is None
+    with elastic.bulk_ingest_settings(index):
+        assert get_setting("index.refresh_interval") == "-1"
+        elastic.upload_documents(index, [dict(title="title", text="text", date="2020-01-01")])
+    assert get_setting("index.refresh_interval") is None
+    # index should be refreshed on exit, so the document should be visible immediately
+    assert query_documents(index).total_count == 1
+    # With overlapping bulk ingests, the settings are only restored when the last one finishes
+    with elastic.bulk_ingest_settings(index):
+        with elastic.bulk_ingest_settings(index):
+            assert get_setting("index.refresh_interval") == "-1"
+        assert get_setting("index.refresh_interval") == "-1"
+        assert get_setting("index.translog.durability") == "async"
+    assert get_setting("index.refresh_interval") is None
+    assert get_setting("index.translog.durability") is None
+
+    # If the temporary settings are already in place (e.g. a bulk ingest in another process, or one that crashed),
+    # they should not be restored afterwards
+    elastic.es().indices.put_settings(index=index, settings=elastic.BULK_INGEST_SETTINGS)
+    with elastic.bulk_ingest_settings(index):
+        assert get_setting("index.refresh_interval") == "-1"
+    assert get_setting("index.refresh_interval") is None
+    assert get_setting("index.translog.durability") is None
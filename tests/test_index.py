@@ -4,8 +4,8 @@ import pytest
 
 from amcat4.config import get_settings
 from amcat4.elastic import es
-from amcat4.index import (Role, create_index, delete_index, deregister_index,
-                          get_global_role, get_guest_role, get_index, get_role,
+from amcat4.index import (Role, create_index, delete_index, delete_user, deregister_index,
+                          get_global_role, get_guest_role, get_index, get_index_role, get_role,
                           list_global_users, list_known_indices, list_users,
                           modify_index, refresh_index, register_index,
                           remove_global_role, remove_role, set_global_role,
@@ -111,6 +111,18 @@ def test_guest_role(index):
     assert get_guest_role(index) == Role.READER
 
 
+def test_get_index_role(index):
+    user = "user@example.com"
+    assert get_index_role(get_index(index), user) is None
+    set_guest_role(index, Role.METAREADER)
+    refresh()
+    assert get_index_role(get_index(index), user) == Role.METAREADER
+    set_role(index, user, Role.WRITER)
+    refresh()
+    assert get_index_role(get_index(index), user) == Role.WRITER
+    assert get_index_role(get_index(index), user) == get_role(index, user)
+
+
 def test_builtin_admin(index):
     user = "admin@example.com"
     get_settings().admin_email = user
@@ -134,6 +146,22 @@ def test_list_users(index, user):
     assert user not in list_users(index)
 
 
+def test_delete_user(index, guest_index):
+    user, other = "user@example.com", "other@example.com"
+    set_global_role(user, Role.WRITER)
+    set_role(index, user, Role.ADMIN)
+    set_role(index, other, Role.READER)
+    refresh()
+    # A role that is not yet visible to search (i.e. not refreshed) should also be removed
+    set_role(guest_index, user, Role.WRITER)
+    delete_user(user)
+    refresh()
+    assert get_global_role(user) is None
+    assert user not in list_users(index)
+    assert user not in list_users(guest_index)
+    assert list_users(index)[other] == Role.READER
+
+
 def test_name_description(index):
     modify_index(index, name="test", description="ooktest")
     refresh()
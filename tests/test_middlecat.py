@@ -1,9 +1,11 @@
 from datetime import datetime
 
+import pytest
 from fastapi.testclient import TestClient
 
+from amcat4.api.auth import InvalidToken, _decode_token, verify_token
 from amcat4.config import get_settings, AuthOptions
-from tests.tools import get_json, create_token
+from tests.tools import amcat_settings, get_json, create_token
 
 
 def test_handler_responses(client: TestClient, admin):
@@ -34,6 +36,19 @@ def test_handler_responses(client: TestClient, admin):
     test(resource='http://wrong.com', exp=now + 1000, email=admin, expected=401)
 
 
+def test_verify_token_cached():
+    now = int(datetime.now().timestamp())
+    token = create_token(resource='http://localhost:3000', exp=now + 1000, email="cached@example.com")
+    assert verify_token(token)['email'] == "cached@example.com"
+    hits = _decode_token.cache_info().hits
+    assert verify_token(token)['email'] == "cached@example.com"
+    assert _decode_token.cache_info().hits == hits + 1
+    # The claims are still checked for a token that was verified (and cached) before
+    with amcat_settings(host="http://wrong.com"):
+        with pytest.raises(InvalidToken):
+            verify_token(token)
+
+
 def test_config(client: TestClient):
     result = get_json(client, "/config")
     assert result['middlecat_url'] == get_settings().middlecat_url
@@ -1,5 +1,7 @@
 from typing import List
 
+import pytest
+
 from amcat4.query import query_documents
 
 
@@ -26,6 +28,20 @@ def test_sort(index_many):
     assert q([{'pagenr': {"order": "desc"}}, 'id']) == [0, 1, 19, 2, 18]
 
 
+def test_search_after(index_many):
+    x = query_documents(index_many, per_page=6, sort=['id'])
+    assert [int(h['_id']) for h in x.data] == [0, 1, 2, 3, 4, 5]
+    assert x.search_after == [5]
+    x = query_documents(index_many, per_page=6, sort=['id'], search_after=x.search_after)
+    assert [int(h['_id']) for h in x.data] == [6, 7, 8, 9, 10, 11]
+    x = query_documents(index_many, per_page=6, sort=['id'], search_after=[17])
+    assert [int(h['_id']) for h in x.data] == [18, 19]
+    with pytest.raises(ValueError):
+        query_documents(index_many, per_page=6, search_after=[17])
+    with pytest.raises(ValueError):
+        query_documents(index_many, per_page=6, sort=['id'], search_after=[17], scroll='5m')
+
+
 def test_scroll(index_many):
     r = query_documents(index_many, queries=["odd"], scroll='5m', per_page=4)
     assert len(r.data) == 4
@@ -44,3 +60,11 @@ def test_scroll(index_many):
     r = query_documents(index_many, scroll_id=r.scroll_id)
     assert r is None
     assert {int(h['_id']) for h in allids} == {0, 2, 4, 6, 8, 10, 12, 14, 16, 18}
+
+
+def test_scroll_sorted(index_many):
+    r = query_documents(index_many, sort=[{"id": {"order": "desc"}}], scroll='5m', per_page=15)
+    assert [int(h['_id']) for h in r.data] == list(range(19, 4, -1))
+    # passing the sort order again on continuation should not break the scroll
+    r = query_documents(index_many, sort=[{"id": {"order": "desc"}}], scroll_id=r.scroll_id)
+    assert [int(h['_id']) for h in r.data] == list(range(4, -1, -1))
@@ -2,6 +2,8 @@ import functools
 import re
 from typing import Set, Optional
 
+import pytest
+
 from amcat4 import query
 from tests.conftest import upload
 
@@ -66,3 +68,31 @@ def test_query_filter_mapping(index_docs):
     q = functools.partial(query_ids, index_docs)
     assert q(filters={"date": {"monthnr": "2"}}) == {1}
     assert q(filters={"date": {"dayofweek": "Monday"}}) == {0, 3}
+
+
+def test_annotations(index):
+    upload(index, [dict(title="title", text="a test text"), dict(title="another title", text="this is a test")])
+    res = query.query_documents(index, queries={"q1": "test", "q2": "text"}, annotations=True)
+    assert {doc['_id']: doc['_annotations'] for doc in res.data} == {
+        '0': [dict(offset=2, length=4, variable="query", value="q1", field="text"),
+              dict(offset=7, length=4, variable="query", value="q2", field="text")],
+        '1': [dict(offset=10, length=4, variable="query", value="q1", field="text")],
+    }
+    assert list(query.query_annotations(index, '1', {"q1": "test", "q2": "text"})) == [
+        dict(offset=10, length=4, variable="query", value="q1", field="text")]
+
+
+def test_extract_highlight_span():
+    text = "  a test text with another test"
+    highlight = "a <em>test</em> <em>text</em> with another <em>test</em>"
+    assert list(query.extract_highlight_span(text, highlight)) == [
+        dict(offset=4, length=9), dict(offset=27, length=4)]
+
+
+def test_build_body_filters():
+    filters = {"date": {"gte": "2018-01-01", "monthnr": "2"}, "cat": {"values": ["a", "b"]}}
+    body = query.build_body(filters=filters)
+    assert filters == {"date": {"gte": "2018-01-01", "monthnr": "2"}, "cat": {"values": ["a", "b"]}}
+    assert set(body['runtime_mappings'].keys()) == {"date_monthnr"}
+    with pytest.raises(ValueError):
+        query.build_body(filters={"date": {"gte": "2018-01-01", "bla": "x"}})
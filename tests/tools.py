@@ -1,8 +1,12 @@
+import functools
 import json
 from contextlib import contextmanager
 from datetime import datetime, date
-from typing import Set, Iterable, Optional
+from types import MappingProxyType
+from typing import Iterable, Mapping, Optional, Set
 
+import orjson
+import pytest
 import requests
 from authlib.jose import jwt
 from fastapi.testclient import TestClient
@@ -18,31 +22,43 @@ def create_token(**payload) -> bytes:
     return token.decode('utf-8')
 
 
-def build_headers(user=None, headers=None):
-    if not headers:
-        headers = {}
-    if user:
-        token = create_token(resource=get_settings().host, email=user, exp=int(datetime.now().timestamp()) + 1000)
-        headers['Authorization'] = f"Bearer {token}"
-    return headers
+@functools.lru_cache()
+def user_token(user: str, host: str) -> str:
+    """Create a token for the given user, reused across calls (like a real client would) so the server can cache it"""
+    return create_token(resource=host, email=user, exp=int(datetime.now().timestamp()) + 24 * 60 * 60)
 
 
+@functools.lru_cache()
+def _auth_headers(user: str, host: str) -> Mapping[str, str]:
+    return MappingProxyType({'Authorization': f"Bearer {user_token(user, host)}"})
+
+
+def build_headers(user=None, headers=None) -> Mapping[str, str]:
+    """Get the (read-only) headers for a request, adding the authentication headers for the user if given"""
+    if not user:
+        return headers or {}
+    auth_headers = _auth_headers(user, get_settings().host)
+    return {**headers, **auth_headers} if headers else auth_headers
+
+
+# The status checks below use pytest.fail rather than assert, so they are not stripped when running with python -O
 def get_json(client: TestClient, url, expected=200, headers=None, user=None, **kargs):
     """Get the given URL. If expected is 2xx, return the result as parsed json"""
     response = client.get(url, headers=build_headers(user, headers), **kargs)
-    content = response.json() if response.content else None
-    assert response.status_code == expected, \
-        f"GET {url} returned {response.status_code}, expected {expected}, {content}"
+    content = orjson.loads(response.content) if response.content else None
+    if response.status_code != expected:
+        pytest.fail(f"GET {url} returned {response.status_code}, expected {expected}, {content}")
     if expected // 100 == 2:
         return content
 
 
 def post_json(client: TestClient, url, expected=201, headers=None, user=None, **kargs):
     response = client.post(url, headers=build_headers(user, headers), **kargs)
-    assert response.status_code == expected, f"POST {url} returned {response.status_code}, expected {expected}\n" \
-                                             f"{response.json()}"
+    content = orjson.loads(response.content) if response.content else None
+    if response.status_code != expected:
+        pytest.fail(f"POST {url} returned {response.status_code}, expected {expected}\n{content}")
     if expected != 204:
-        return response.json()
+        return content
 
 
 class DateTimeEncoder(json.JSONEncoder):
@@ -58,9 +74,10 @@ def dictset(dicts: Iterable[dict]) -> Set[str]:
 
 
 def check(response: requests.Response, expected: int, msg: Optional[str] = None):
-    assert response.status_code == expected, \
-        f"{msg or ''}{': ' if msg else ''}Unexpected status: received {response.status_code} != expected {expected};"\
-        f" reply: {response.json()}"
+    if response.status_code != expected:
+        reply = orjson.loads(response.content) if response.content else None
+        pytest.fail(f"{msg or ''}{': ' if msg else ''}Unexpected status: received {response.status_code} != "
+                    f"expected {expected}; reply: {reply}")
 
 
 @contextmanager